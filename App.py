@@ -24,10 +24,13 @@ import wave
 import struct
 import datetime
 from PIL import Image, ImageDraw
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import os
-import random
 import time
+import threading
+import queue
+import traceback
+from numba import njit, prange
 
 # =============== CONSTANTS ===============
 GRID_SIZE = 64
@@ -43,12 +46,22 @@ INSTRUMENTS = [
     ((255, 230, 100),"Bass",   "4", "🟡"),
     ((200, 120, 255),"Lead",   "5", "🟣")
 ]
-COLOR_TO_IDX = {tuple(c): i for i, (c, *_ ) in enumerate(INSTRUMENTS)}
+RNG_SEED = None  # set an int for reproducible noise and mutations
+RNG = np.random.default_rng(RNG_SEED)
+PALETTE = np.array([c for c, *_ in INSTRUMENTS], dtype=np.uint8)
+# Extra black row so that index -1 (empty cell) maps to black
+PALETTE_RGB = np.vstack([PALETTE, np.zeros((1, 3), dtype=np.uint8)])
 
 # ============ INITIALIZATION ============
+# Mono 16-bit output so loops are handed to the mixer without a stereo copy.
+# No allowed changes: SDL converts to whatever the device really wants.
+pygame.mixer.pre_init(SAMPLE_RATE, -16, 1, 512, allowedchanges=0)
 pygame.init()
 window_size = (GRID_SIZE * PIXEL_ZOOM, GRID_SIZE * PIXEL_ZOOM + UI_HEIGHT)
-screen = pygame.display.set_mode(window_size, pygame.RESIZABLE)
+# SCALED keeps the logical window size (and mouse coords) fixed in any mode;
+# all pixel work happens on offscreen surfaces so the screen is never locked
+DISPLAY_FLAGS = pygame.SCALED | pygame.DOUBLEBUF
+screen = pygame.display.set_mode(window_size, pygame.RESIZABLE | DISPLAY_FLAGS)
 pygame.display.set_caption("PixelSynth – Draw Music, Hear Colors")
 clock = pygame.time.Clock()
 font = pygame.font.SysFont("Arial", 16, bold=True)
@@ -56,69 +69,287 @@ fullscreen = False
 playhead_start_time = None
 
 # ============ GRID ============
-grid = np.zeros((GRID_SIZE, GRID_SIZE, 3), dtype=np.uint8)
+# Instrument index per cell (-1 = empty); RGB is only derived for display
+grid_idx = np.full((GRID_SIZE, GRID_SIZE), -1, dtype=np.int8)
 current_color_idx = 0
 playing = False
 mouse_down = False
 mouse_button = 1
 
+# Grid is drawn as one 64x64 surface scaled up, plus a cached cell-outline overlay
+grid_surf = pygame.Surface((GRID_SIZE, GRID_SIZE), 0, 32)
+# Palette packed into grid_surf's native uint32 pixel format (-1 -> black)
+PALETTE_U32 = np.array([grid_surf.map_rgb(tuple(c)) for c in PALETTE_RGB], dtype=np.uint32)
+grid_zoom_surf = pygame.Surface((GRID_SIZE * PIXEL_ZOOM, GRID_SIZE * PIXEL_ZOOM))
+grid_lines = pygame.Surface((GRID_SIZE * PIXEL_ZOOM, GRID_SIZE * PIXEL_ZOOM), pygame.SRCALPHA)
+for i in range(GRID_SIZE):
+    for p in (i*PIXEL_ZOOM, i*PIXEL_ZOOM + PIXEL_ZOOM - 1):
+        pygame.draw.line(grid_lines, (50,50,50), (p, 0), (p, GRID_SIZE*PIXEL_ZOOM - 1))
+        pygame.draw.line(grid_lines, (50,50,50), (0, p), (GRID_SIZE*PIXEL_ZOOM - 1, p))
+# Translucent playhead column, built once and blitted wherever the step is
+PLAYHEAD_SURF = pygame.Surface((PIXEL_ZOOM, GRID_SIZE * PIXEL_ZOOM), pygame.SRCALPHA)
+PLAYHEAD_SURF.fill((120,220,255, 70))
+
 # ============ AUDIO ENGINE ============
-def synth_note(inst_idx, t):
-    # t: time array (float, seconds)
+# Numba's default (workqueue) threading layer aborts if two parallel kernels run
+# at once, and the render worker runs alongside the main loop.
+kernel_lock = threading.Lock()
+
+# Waveform kernels are compiled at import (explicit signatures) and cached on disk.
+@njit("void(float32[:], float32[:])", cache=True, fastmath=True)
+def synth_kick(t, out):
+    for i in range(t.shape[0]):
+        out[i] = 0.8 * np.exp(-t[i]*8) * np.sin(2*np.pi*55*(1-0.5*t[i])*t[i])
+
+@njit("void(float32[:], float32[:], float32[:])", cache=True, fastmath=True)
+def synth_snare(t, noise, out):
+    for i in range(t.shape[0]):
+        tone = np.sin(2*np.pi*220*t[i]) * 0.3
+        out[i] = np.exp(-t[i]*12) * (0.7*noise[i] + 0.3*tone)
+
+@njit("void(float32[:], float32[:], float32[:])", cache=True, fastmath=True)
+def synth_hihat(t, noise, out):
+    for i in range(t.shape[0]):
+        out[i] = 0.5 * np.exp(-t[i]*30) * noise[i]
+
+@njit("void(float32[:], float32[:])", cache=True, fastmath=True)
+def synth_bass(t, out):
+    for i in range(t.shape[0]):
+        out[i] = 0.7 * np.exp(-t[i]*4) * np.sin(2*np.pi*110*t[i])
+
+@njit("void(float32[:], float32[:])", cache=True, fastmath=True)
+def synth_lead(t, out):
+    for i in range(t.shape[0]):
+        osc = (np.sin(2*np.pi*440*t[i]) + np.sin(2*np.pi*660*t[i])*0.5 + np.sin(2*np.pi*880*t[i])*0.3)
+        out[i] = 0.5 * np.exp(-t[i]*2) * osc
+
+def synth_note(inst_idx, t, noise):
+    # t: time array (float, seconds); noise: same length, fed to snare/hi-hat
+    out = np.zeros_like(t)
     if inst_idx == 0:  # Kick
-        env = np.exp(-t*8)
-        return 0.8 * env * np.sin(2*np.pi*55*(1-0.5*t)*t)
+        synth_kick(t, out)
     elif inst_idx == 1:  # Snare
-        env = np.exp(-t*12)
-        noise = np.random.uniform(-1,1,len(t))
-        tone = np.sin(2*np.pi*220*t) * 0.3
-        return env * (0.7*noise + 0.3*tone)
+        synth_snare(t, noise, out)
     elif inst_idx == 2:  # Hi-Hat
-        env = np.exp(-t*30)
-        noise = np.random.uniform(-1,1,len(t))
-        return 0.5 * env * noise
+        synth_hihat(t, noise, out)
     elif inst_idx == 3:  # Bass
-        env = np.exp(-t*4)
-        return 0.7 * env * np.sin(2*np.pi*110*t)
+        synth_bass(t, out)
     elif inst_idx == 4:  # Lead
-        env = np.exp(-t*2)
-        osc = (np.sin(2*np.pi*440*t) + np.sin(2*np.pi*660*t)*0.5 + np.sin(2*np.pi*880*t)*0.3)
-        return 0.5 * env * osc
-    return np.zeros_like(t)
-
-def grid_to_audio(grid):
-    # Each column = 1 step, each row = instrument
-    steps = GRID_SIZE
-    step_samples = SAMPLE_RATE * LOOP_LEN_SEC // steps
-    audio = np.zeros(LOOP_LEN_SEC * SAMPLE_RATE)
-    for x in range(steps):
-        for y in range(GRID_SIZE):
-            color = tuple(grid[y, x])
-            if color in COLOR_TO_IDX:
-                inst_idx = COLOR_TO_IDX[color]
-                t = np.linspace(0, step_samples/SAMPLE_RATE, step_samples, endpoint=False)
-                note = synth_note(inst_idx, t)
-                start = x * step_samples
-                end = start + step_samples
-                audio[start:end] += note[:min(len(note), end-start)]
-    # Normalize
-    audio = audio / (np.max(np.abs(audio)) + 1e-6)
+        synth_lead(t, out)
+    return out
+
+# Every trigger is one step long, so each voice is rendered once at import.
+# The whole audio path is float32 up to the final int16 conversion.
+# Voices are linear in their noise input: WAVES is the noise-free part and
+# NOISE_GAIN the per-sample gain applied to a slice of the shared NOISE pool.
+STEP_SAMPLES = SAMPLE_RATE * LOOP_LEN_SEC // GRID_SIZE
+T = np.arange(STEP_SAMPLES, dtype=np.float32) / np.float32(SAMPLE_RATE)
+WAVES = np.stack([synth_note(i, T, np.zeros_like(T)) for i in range(len(INSTRUMENTS))])
+NOISE_GAIN = np.stack([synth_note(i, T, np.ones_like(T)) for i in range(len(INSTRUMENTS))]) - WAVES
+# Unit-variance noise scaled to the RMS of the old uniform(-1, 1) noise
+NOISE = RNG.standard_normal(STEP_SAMPLES * GRID_SIZE, dtype=np.float32) / np.float32(np.sqrt(3))
+
+@njit("void(int8[:, :], int64[:, :], float32[:, :], float32[:, :], float32[:], float32[:])",
+      cache=True, fastmath=True, parallel=True)
+def _render_loop(grid_idx, noise_offsets, waves, noise_gain, noise, audio):
+    # Columns write disjoint slices of audio, so they mix in parallel
+    step_samples = waves.shape[1]
+    for x in prange(grid_idx.shape[1]):
+        start = x * step_samples
+        for y in range(grid_idx.shape[0]):
+            inst = grid_idx[y, x]
+            if inst >= 0:
+                off = noise_offsets[y, x]
+                for i in range(step_samples):
+                    audio[start + i] += waves[inst, i] + noise_gain[inst, i] * noise[off + i]
+
+def random_noise_offsets(shape):
+    # Random slice of the noise pool per trigger so repeated drums differ
+    return RNG.integers(0, len(NOISE) - STEP_SAMPLES + 1, size=shape)
+
+def render_mix(grid_idx, noise_offsets):
+    # Each column = 1 step, each row = instrument (unnormalized)
+    audio = np.zeros(LOOP_LEN_SEC * SAMPLE_RATE, dtype=np.float32)
+    with kernel_lock:
+        _render_loop(grid_idx, noise_offsets, WAVES, NOISE_GAIN, NOISE, audio)
     return audio
 
-def play_audio(audio):
-    # Convert to 16-bit and play with pygame
-    arr = (audio * 32767).astype(np.int16)
-    sound = pygame.sndarray.make_sound(arr.reshape(-1,1).repeat(2,axis=1))
-    sound.play(loops=-1)  # Loop forever until stopped
-    return sound
+SILENCE_FLOOR = 1e-4  # peaks below this are rounding residue, not sound
+
+def loop_gain(audio):
+    # Gain that normalizes the loop; near-silent mixes stay silent instead of blowing up
+    p = max(audio.max(), -audio.min())
+    return 0.0 if p < SILENCE_FLOOR else 1 / (p + 1e-6)
+
+def normalize(audio):
+    return audio * loop_gain(audio)
+
+# Reused int16 buffer for WAV export
+_i16_buf = np.empty(LOOP_LEN_SEC * SAMPLE_RATE, dtype=np.int16)
+
+def to_int16(audio, out, gain=1.0):
+    # Scale and cast in one pass straight into an int16 buffer (no float temporaries);
+    # a (n, channels) buffer gets the mono loop broadcast across its channels
+    if out.ndim == 2:
+        audio = audio[:, None]
+    return np.multiply(audio, np.float32(32767 * gain), out=out, casting='unsafe')
+
+def grid_to_audio(grid_idx):
+    audio = render_mix(grid_idx, random_noise_offsets(grid_idx.shape))
+    audio *= loop_gain(audio)
+    return audio
+
+# Persistent unnormalized mix of grid_idx; set_cell() re-renders the edited column.
+# None means a bulk edit (reset/mutate) happened and the next play re-renders.
+mix = None
+mix_offsets = np.zeros((GRID_SIZE, GRID_SIZE), dtype=np.int64)
+
+def voice(inst, offset):
+    return WAVES[inst] + NOISE_GAIN[inst] * NOISE[offset:offset + STEP_SAMPLES]
+
+def set_cell(gy, gx, inst):
+    old = grid_idx[gy, gx]
+    if old == inst:
+        return
+    grid_idx[gy, gx] = inst
+    if mix is None:
+        return
+    if inst >= 0:
+        mix_offsets[gy, gx] = random_noise_offsets(None)
+    # Rebuild just this column from scratch so add/subtract rounding never accumulates
+    seg = mix[gx*STEP_SAMPLES:(gx+1)*STEP_SAMPLES]
+    seg[:] = 0
+    for y in np.flatnonzero(grid_idx[:, gx] >= 0):
+        seg += voice(grid_idx[y, gx], mix_offsets[y, gx])
+
+def current_audio():
+    # Normalized loop for grid_idx, re-rendering only after bulk edits
+    global mix, mix_offsets
+    if mix is None:
+        mix_offsets = random_noise_offsets(grid_idx.shape)
+        mix = render_mix(grid_idx, mix_offsets)
+    return normalize(mix)
+
+# Two loop-length Sounds (front plays, back gets filled) swapped when a render lands.
+# Their SDL buffers are overwritten in place, so no Sound is created after startup.
+# Sized from the mixer's actual channel count, so a stereo mixer still works.
+# Without an audio device the mixer is not initialized and playback is skipped.
+loop_sounds = loop_samples = None
+if pygame.mixer.get_init():
+    MIXER_CHANNELS = pygame.mixer.get_init()[2]
+    loop_sounds = [pygame.mixer.Sound(buffer=bytes(LOOP_LEN_SEC * SAMPLE_RATE * 2 * MIXER_CHANNELS)) for _ in range(2)]
+    loop_samples = [pygame.sndarray.samples(snd) for snd in loop_sounds]
+front = 0
+render_q = queue.Queue(maxsize=1)
+sound_lock = threading.Lock()
+pending_sound = None   # (back index, unnormalized mix, grid snapshot, noise offsets, generation)
+render_gen = 0         # bumped on stop so late renders are dropped
+
+def render_worker():
+    # Renders off the main loop and fills the back buffer; the main loop swaps it in
+    global pending_sound
+    while True:
+        snap, offsets, audio, gen = render_q.get()
+        try:
+            if audio is None:
+                audio = render_mix(snap, offsets)
+            gain = loop_gain(audio)
+            with sound_lock:
+                back = 1 - front
+                to_int16(audio, loop_samples[back], gain)
+                pending_sound = (back, audio, snap, offsets, gen)
+        except Exception:
+            # One bad job must not take down the only render thread
+            traceback.print_exc()
+
+threading.Thread(target=render_worker, daemon=True).start()
+
+def request_audio():
+    # Queue the current loop for playback; a clean mix only needs normalizing
+    if loop_sounds is None:
+        return
+    if mix is None:
+        # Fresh offsets per job; they become mix_offsets only if this render is adopted
+        job = (grid_idx.copy(), random_noise_offsets(grid_idx.shape), None, render_gen)
+    else:
+        job = (None, None, mix.copy(), render_gen)
+    # Replace a job the worker has not picked up yet
+    try:
+        render_q.get_nowait()
+    except queue.Empty:
+        pass
+    render_q.put(job)
+
+def swap_pending_sound():
+    # Called every frame: start the freshly rendered loop, if any
+    global front, pending_sound, mix, mix_offsets
+    with sound_lock:
+        if pending_sound is None:
+            return False
+        back, audio, snap, offsets, gen = pending_sound
+        pending_sound = None
+        if gen != render_gen:
+            return False
+        loop_sounds[front].stop()
+        loop_sounds[back].play(loops=-1)  # Loop forever until stopped
+        front = back
+    # Keep a full render as the live mix if nothing was edited meanwhile
+    if mix is None and snap is not None and np.array_equal(snap, grid_idx):
+        mix, mix_offsets = audio, offsets
+    return True
+
+def stop_audio():
+    global render_gen
+    with sound_lock:
+        render_gen += 1
+        if loop_sounds is not None:
+            loop_sounds[front].stop()
 
 # ============ UI ============
+_glyphs = {}
+
+def glyph(ch, color):
+    # Rasterize each (character, colour) once; unusual characters just land in the cache too
+    g = _glyphs.get((ch, color))
+    if g is None:
+        g = _glyphs[(ch, color)] = font.render(ch, True, color)
+    return g
+
+_layouts = {}
+
+def text_layout(text):
+    # Pen x of each character as font.render would place it; glyph surface widths and
+    # per-glyph advances both overshoot (bearings, synthetic-bold padding on every glyph)
+    xs = _layouts.get(text)
+    if xs is None:
+        xs = _layouts[text] = [font.size(text[:i])[0] for i in range(len(text) + 1)]
+    return xs
+
+def text_width(text):
+    return text_layout(text)[-1]
+
+def draw_text(surf, text, x, y, color):
+    # Blit cached glyphs at their pen positions; returns the x just past the text
+    xs = text_layout(text)
+    for ch, dx in zip(text, xs):
+        surf.blit(glyph(ch, color), (x + dx, y))
+    return x + xs[-1]
+
+_ui_cache = None
+_ui_key = None
+
 def draw_ui():
+    # Panel only changes with the selected instrument, so reuse the last render
+    global _ui_cache, _ui_key
+    ui_key = (current_color_idx, GRID_SIZE * PIXEL_ZOOM)
+    if _ui_cache is not None and ui_key == _ui_key:
+        screen.blit(_ui_cache, (0,0))
+        return
     panel = pygame.Surface((GRID_SIZE * PIXEL_ZOOM, UI_HEIGHT))
     panel.fill((22, 24, 32))
     # Title (centered)
-    title = font.render("PixelSynth – Draw Music, Hear Colors", True, (255,255,255))
-    panel.blit(title, ((panel.get_width() - title.get_width()) // 2, 10))
+    title = "PixelSynth – Draw Music, Hear Colors"
+    draw_text(panel, title, (panel.get_width() - text_width(title)) // 2, 10, (255,255,255))
 
     # Horizontal line under title
     pygame.draw.line(panel, (40, 60, 100), (20, 38), (panel.get_width()-20, 38), 2)
@@ -135,11 +366,9 @@ def draw_ui():
         # Color swatch
         pygame.draw.rect(panel, color, (x, y, 30, 30), border_radius=6)
         # Emoji and name
-        label = font.render(f"{emoji} {name}", True, (255,255,255) if i==current_color_idx else (180,180,180))
-        panel.blit(label, (x+38, y+4))
+        draw_text(panel, f"{emoji} {name}", x+38, y+4, (255,255,255) if i==current_color_idx else (180,180,180))
         # Key shortcut
-        keytxt = font.render(f"[{key}]", True, (120,180,255) if i==current_color_idx else (100,100,120))
-        panel.blit(keytxt, (x+38, y+18))
+        draw_text(panel, f"[{key}]", x+38, y+18, (120,180,255) if i==current_color_idx else (100,100,120))
 
     # Controls bar (bottom, minimal)
     controls = [
@@ -155,82 +384,129 @@ def draw_ui():
     cx = 30
     cy = UI_HEIGHT - 18  # Move closer to the bottom
     for key, label in controls:
-        ktxt = font.render(key, True, (120,200,255))
-        ltxt = font.render(label, True, (180,180,180))
-        panel.blit(ktxt, (cx, cy))
-        panel.blit(ltxt, (cx+ktxt.get_width()+8, cy))
-        cx += ktxt.get_width() + ltxt.get_width() + 32
+        lx = draw_text(panel, key, cx, cy, (120,200,255)) + 8
+        cx = draw_text(panel, label, lx, cy, (180,180,180)) + 24
 
     # Subtle line above controls
     pygame.draw.line(panel, (40, 60, 100), (20, UI_HEIGHT-28), (panel.get_width()-20, UI_HEIGHT-28), 1)
 
+    _ui_cache, _ui_key = panel, ui_key
     screen.blit(panel, (0,0))
 
+def grid_to_rgb(grid_idx):
+    return PALETTE_RGB[grid_idx]
+
+def grid_to_image(grid_idx):
+    # Nearest-neighbour zoom as a plain repeat, no PIL resampler
+    big = grid_to_rgb(grid_idx).repeat(PIXEL_ZOOM, 0).repeat(PIXEL_ZOOM, 1)
+    return Image.fromarray(big, 'RGB')
+
+_last_grid = None
+
 def draw_grid(playhead_col=None):
-    for y in range(GRID_SIZE):
-        for x in range(GRID_SIZE):
-            rect = pygame.Rect(x*PIXEL_ZOOM, y*PIXEL_ZOOM+UI_HEIGHT, PIXEL_ZOOM, PIXEL_ZOOM)
-            pygame.draw.rect(screen, grid[y,x], rect)
-            # Step highlight: outline cells in playhead column
-            if playhead_col is not None and x == playhead_col:
-                pygame.draw.rect(screen, (255,255,180), rect, 2)
-            else:
-                pygame.draw.rect(screen, (50,50,50), rect, 1)
-    # Draw playhead if provided
+    # Rebuild the zoomed canvas (cells + outlines) only when grid_idx changed
+    global _last_grid
+    if _last_grid is None or not np.array_equal(grid_idx, _last_grid):
+        pygame.surfarray.blit_array(grid_surf, PALETTE_U32[grid_idx].T)
+        pygame.transform.scale(grid_surf, grid_zoom_surf.get_size(), grid_zoom_surf)
+        grid_zoom_surf.blit(grid_lines, (0, 0))
+        _last_grid = grid_idx.copy()
+    screen.blit(grid_zoom_surf, (0, UI_HEIGHT))
+    # Draw playhead if provided: column outline plus translucent overlay
     if playhead_col is not None:
-        s = pygame.Surface((PIXEL_ZOOM, GRID_SIZE*PIXEL_ZOOM), pygame.SRCALPHA)
-        s.fill((120,220,255, 70))
-        screen.blit(s, (playhead_col*PIXEL_ZOOM, UI_HEIGHT))
+        rect = pygame.Rect(playhead_col*PIXEL_ZOOM, UI_HEIGHT, PIXEL_ZOOM, GRID_SIZE*PIXEL_ZOOM)
+        pygame.draw.rect(screen, (255,255,180), rect, 2)
+        screen.blit(PLAYHEAD_SURF, rect.topleft)
+
+scanlines = None
 
 def scanline_shader():
-    arr = pygame.surfarray.pixels3d(screen)
-    arr[:,UI_HEIGHT::2,:] = (arr[:,UI_HEIGHT::2,:]//2)
+    # Halve every other row below the UI with a cached multiply overlay
+    global scanlines
+    if scanlines is None or scanlines.get_size() != screen.get_size():
+        scanlines = pygame.Surface(screen.get_size())
+        scanlines.fill((255,255,255))
+        for y in range(UI_HEIGHT, scanlines.get_height(), 2):
+            pygame.draw.line(scanlines, (128,128,128), (0, y), (scanlines.get_width()-1, y))
+    screen.blit(scanlines, (0,0), special_flags=pygame.BLEND_RGB_MULT)
 
 # ============ MUTATE ============
-def mutate_grid():
-    for _ in range(GRID_SIZE*GRID_SIZE//10):
-        x = random.randint(0, GRID_SIZE-1)
-        y = random.randint(0, GRID_SIZE-1)
-        if random.random() < 0.5:
+@njit("uint64(uint64)", cache=True)
+def _xorshift(s):
+    s ^= s << np.uint64(13)
+    s ^= s >> np.uint64(7)
+    s ^= s << np.uint64(17)
+    return s
+
+@njit("void(int8[:, :], int64, int64, uint64)", cache=True, parallel=True)
+def _mutate(grid_idx, n, n_inst, seed):
+    # Each mutation draws from its own xorshift stream (seed + i), so drawing runs in
+    # parallel; the writes are then applied in index order to stay reproducible
+    size = np.uint64(grid_idx.shape[0])
+    ys = np.empty(n, dtype=np.int64)
+    xs = np.empty(n, dtype=np.int64)
+    insts = np.empty(n, dtype=np.int8)   # -1 = mirror instead of flip
+    for i in prange(n):
+        s = _xorshift((seed + np.uint64(i)) * np.uint64(0x9E3779B97F4A7C15) | np.uint64(1))
+        xs[i] = np.int64(s % size)
+        s = _xorshift(s)
+        ys[i] = np.int64(s % size)
+        s = _xorshift(s)
+        if s & np.uint64(1):
+            s = _xorshift(s)
+            insts[i] = np.int8(s % np.uint64(n_inst))
+        else:
+            insts[i] = -1
+    for i in range(n):
+        y, x = ys[i], xs[i]
+        if insts[i] >= 0:
             # Flip color
-            grid[y,x] = INSTRUMENTS[random.randint(0,4)][0]
+            grid_idx[y, x] = insts[i]
         else:
             # Mirror or rotate
-            grid[y,x] = grid[x%GRID_SIZE, y%GRID_SIZE]
+            grid_idx[y, x] = grid_idx[x, y]
+
+def mutate_grid():
+    global mix
+    mix = None
+    with kernel_lock:
+        _mutate(grid_idx, GRID_SIZE*GRID_SIZE//10, len(INSTRUMENTS), np.uint64(RNG.integers(0, 2**63)))
 
 # ============ SNAPSHOT ============
 def save_snapshot():
     now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    img = Image.fromarray(grid, 'RGB').resize((GRID_SIZE*PIXEL_ZOOM, GRID_SIZE*PIXEL_ZOOM), Image.NEAREST)
+    img = grid_to_image(grid_idx)
     img.save(f"pixelsynth_{now}.png")
-    audio = grid_to_audio(grid)
+    audio = current_audio()
     with wave.open(f"pixelsynth_{now}.wav", 'w') as wf:
         wf.setnchannels(1)
         wf.setsampwidth(2)
         wf.setframerate(SAMPLE_RATE)
-        arr = (audio * 32767).astype(np.int16)
-        wf.writeframes(arr.tobytes())
-    # Spectrogram
-    plt.figure(figsize=(8,4))
-    plt.specgram(audio, Fs=SAMPLE_RATE, cmap='nipy_spectral')
-    plt.axis('off')
-    plt.tight_layout()
-    plt.savefig(f"pixelsynth_{now}_spec.png", bbox_inches='tight', pad_inches=0)
-    plt.close()
+        wf.writeframes(to_int16(audio, _i16_buf))
+    # Spectrogram is the slow part, so draw it without blocking the UI
+    threading.Thread(target=save_spectrogram, args=(audio, f"pixelsynth_{now}_spec.png"), daemon=True).start()
+
+def save_spectrogram(audio, path):
+    # Thumbnail only: average down 4x (cheap low-pass + decimate) before the FFTs.
+    # Uses Figure directly since pyplot is not safe off the main thread.
+    audio_dec = audio[:len(audio)//4*4].reshape(-1, 4).mean(axis=1)
+    fig = Figure(figsize=(8,4))
+    ax = fig.add_subplot()
+    ax.specgram(audio_dec, Fs=SAMPLE_RATE//4, NFFT=256, noverlap=128, cmap='nipy_spectral')
+    ax.axis('off')
+    fig.tight_layout()
+    fig.savefig(path, bbox_inches='tight', pad_inches=0)
 
 # ============ ANIMATED GIF ============
 def save_gif():
     now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     frames = []
-    g = grid.copy()
     for _ in range(8):
-        img = Image.fromarray(g, 'RGB').resize((GRID_SIZE*PIXEL_ZOOM, GRID_SIZE*PIXEL_ZOOM), Image.NEAREST)
-        frames.append(img)
+        frames.append(grid_to_image(grid_idx))
         mutate_grid()
     frames[0].save(f"pixelsynth_{now}.gif", save_all=True, append_images=frames[1:], duration=300, loop=0)
 
 # ============ MAIN LOOP ============
-sound = None
 while True:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -242,27 +518,25 @@ while True:
                 playing = not playing
                 if playing:
                     playhead_start_time = time.time()
-                    audio = grid_to_audio(grid)
-                    if sound: sound.stop()
-                    sound = play_audio(audio)
+                    request_audio()
                 else:
-                    if sound: sound.stop()
+                    stop_audio()
             elif event.key == pygame.K_s:
                 save_snapshot()
             elif event.key == pygame.K_m:
                 mutate_grid()
             elif event.key == pygame.K_r:
-                grid[:,:] = 0
+                grid_idx[:,:] = -1
+                mix = None
             elif event.key == pygame.K_t:
-                audio = grid_to_audio(grid)
-                if sound: sound.stop()
-                sound = play_audio(audio)
+                request_audio()
             elif event.key == pygame.K_f:
                 fullscreen = not fullscreen
+                _ui_cache = None
                 if fullscreen:
-                    screen = pygame.display.set_mode((0,0), pygame.FULLSCREEN)
+                    screen = pygame.display.set_mode(window_size, pygame.FULLSCREEN | DISPLAY_FLAGS)
                 else:
-                    screen = pygame.display.set_mode(window_size, pygame.RESIZABLE)
+                    screen = pygame.display.set_mode(window_size, pygame.RESIZABLE | DISPLAY_FLAGS)
             elif event.key == pygame.K_g:
                 save_gif()
             elif event.unicode in "12345":
@@ -275,9 +549,9 @@ while True:
             gy = (my - UI_HEIGHT) // PIXEL_ZOOM
             if 0 <= gx < GRID_SIZE and 0 <= gy < GRID_SIZE:
                 if mouse_button == 1:
-                    grid[gy, gx] = INSTRUMENTS[current_color_idx][0]
+                    set_cell(gy, gx, current_color_idx)
                 elif mouse_button == 3:
-                    grid[gy, gx] = (0,0,0)
+                    set_cell(gy, gx, -1)
             if event.button == 4:  # wheel up
                 current_color_idx = (current_color_idx - 1) % len(INSTRUMENTS)
             elif event.button == 5:  # wheel down
@@ -290,9 +564,13 @@ while True:
             gy = (my - UI_HEIGHT) // PIXEL_ZOOM
             if 0 <= gx < GRID_SIZE and 0 <= gy < GRID_SIZE:
                 if mouse_button == 1:
-                    grid[gy, gx] = INSTRUMENTS[current_color_idx][0]
+                    set_cell(gy, gx, current_color_idx)
                 elif mouse_button == 3:
-                    grid[gy, gx] = (0,0,0)
+                    set_cell(gy, gx, -1)
+
+    # Start a finished background render; the playhead restarts with it
+    if swap_pending_sound() and playing:
+        playhead_start_time = time.time()
 
     # Playhead logic
     playhead_col = None